@@ -4,6 +4,9 @@ import os
 import logging
 from config import config
 from utils.error_handlers import register_error_handlers
+from utils.validators import init_validators
+from utils.json_provider import OrjsonProvider
+from services import _settings as service_settings
 
 # Configure logging for debugging
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +22,7 @@ def create_app(config_name=None):
 
     logger.info(f"Creating Flask app with config: {config_name}")
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     
     # Load configuration
     try:
@@ -31,6 +35,8 @@ def create_app(config_name=None):
     # Enable CORS
     CORS(app)
     register_error_handlers(app)
+    service_settings.init_app(app)
+    init_validators(app)
     
     # Register blueprints with error handling
     try:
@@ -55,14 +61,25 @@ def create_app(config_name=None):
     logger.info("Flask app created successfully")
     return app
 
+
+_APP = None
+
+
+def get_app():
+    """Return the process-wide app, creating it on first use"""
+    global _APP
+    if _APP is None:
+        _APP = create_app()
+    return _APP
+
+
 # WSGI entry point for gunicorn
 try:
-    app = create_app(os.getenv('FLASK_CONFIG', 'default'))
+    app = get_app()
 except Exception as e:
     logger.error(f"FATAL: Failed to create app: {e}", exc_info=True)
     raise
 
 if __name__ == '__main__':
     # Local development
-    dev_app = create_app(os.getenv('FLASK_ENV', 'development'))
-    dev_app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    get_app().run(host='0.0.0.0', port=5000, debug=True)
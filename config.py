@@ -1,14 +1,24 @@
 import os
 from dotenv import load_dotenv
 
-load_dotenv()
+# Parse .env once per process tree; forked gunicorn workers inherit the result
+if not os.environ.get('_DOTENV_LOADED'):
+    load_dotenv(override=False)
+    os.environ['_DOTENV_LOADED'] = '1'
 
 
 class Config:
-    """Base configuration"""
+    """
+    Base configuration
+    
+    Hot paths read copies of some settings from module globals instead of
+    current_app.config (services/_settings, utils/validators). Those start
+    from these class defaults and are re-synced from app.config at startup.
+    """
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 5242880))  # 5MB
     MAX_IMAGES_PER_REQUEST = int(os.getenv('MAX_IMAGES_PER_REQUEST', 10))
+    MAX_SEARCH_RESULTS = int(os.getenv('MAX_SEARCH_RESULTS', 50))
     ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 'png,jpg,jpeg,webp').split(','))
     REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', 30))
     MAX_RETRIES = int(os.getenv('MAX_RETRIES', 3))
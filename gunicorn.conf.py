@@ -0,0 +1,16 @@
+import os
+
+# Threaded workers let one process overlap many I/O-bound provider calls.
+# Any setting can be overridden through GUNICORN_CMD_ARGS.
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8080')
+# Threads already cover the I/O waits, and every worker holds its own image
+# caches, so stay at a few processes. sched_getaffinity honours the CPUs a
+# container is pinned to, where cpu_count() reports every host core.
+_cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+workers = int(os.getenv('GUNICORN_WORKERS', min(_cpus or 1, 4)))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+timeout = 120
+
+# Import the app (and parse .env) once in the master before forking workers
+preload_app = True
@@ -1,14 +1,79 @@
 from flask import Blueprint, request, jsonify
-import base64
-from services.image_gen_service import OpenAIImageService, StabilityAIService, ReplicateService
 from utils.validators import validate_api_key
 from utils.error_handlers import APIError
+from utils.lazy import LazyServices
+from utils.image_cache import get_or_generate, request_key
 
 bp = Blueprint('image_generation', __name__, url_prefix='/api')
 
-openai_image = OpenAIImageService()
-stability_ai = StabilityAIService()
-replicate = ReplicateService()
+_services = LazyServices({
+    'openai_image': ('services.image_gen_service', 'OpenAIImageService'),
+    'stability_ai': ('services.image_gen_service', 'StabilityAIService'),
+    'replicate': ('services.image_gen_service', 'ReplicateService'),
+})
+_get = _services.get
+
+
+def __getattr__(name):
+    if name in _services:
+        return _get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _openai_params(model, data):
+    return {
+        'model': model or 'dall-e-3',
+        'size': data.get('size', '1024x1024'),
+        'quality': data.get('quality', 'standard'),
+        'style': data.get('style', 'vivid'),
+        'n': data.get('n', 1)
+    }
+
+
+def _generate_openai(prompt, api_key, params):
+    images = _get('openai_image').generate_image(prompt=prompt, api_key=api_key, **params)
+    return images, params['model']
+
+
+def _stability_params(model, data):
+    return {
+        'engine': model or 'stable-diffusion-xl-1024-v1-0',
+        'width': data.get('width', 1024),
+        'height': data.get('height', 1024),
+        'cfg_scale': data.get('cfg_scale', 7),
+        'steps': data.get('steps', 30),
+        'samples': data.get('samples', 1),
+        'seed': data.get('seed')
+    }
+
+
+def _generate_stability(prompt, api_key, params):
+    images = _get('stability_ai').generate_image(prompt=prompt, api_key=api_key, **params)
+    return images, params['engine']
+
+
+def _replicate_params(model, data):
+    return {
+        'model': model or 'stability-ai/sdxl:latest',
+        'width': data.get('width', 1024),
+        'height': data.get('height', 1024),
+        **data.get('replicate_params', {})
+    }
+
+
+def _generate_replicate(prompt, api_key, params):
+    result = _get('replicate').generate_image(prompt=prompt, api_key=api_key, **params)
+    # Replicate returns a single URL or list
+    images = result if isinstance(result, list) else [result]
+    return images, params['model']
+
+
+# provider -> (resolve request parameters with defaults, generate from them)
+_DISPATCH = {
+    'openai': (_openai_params, _generate_openai),
+    'stability': (_stability_params, _generate_stability),
+    'replicate': (_replicate_params, _generate_replicate),
+}
 
 
 @bp.route('/generate-image', methods=['POST'])
@@ -38,7 +103,9 @@ def generate_image():
         "seed": null or int,
         
         // Replicate parameters (varies by model)
-        "replicate_params": {}
+        "replicate_params": {},
+        
+        "cache": false (true reuses the result of an identical request from the last 10 minutes)
     }
     
     Response:
@@ -70,65 +137,19 @@ def generate_image():
         if not is_valid:
             return jsonify({'error': error_msg}), 401
         
-        # Generate image based on provider
-        if provider == 'openai':
-            model = model or 'dall-e-3'
-            size = data.get('size', '1024x1024')
-            quality = data.get('quality', 'standard')
-            style = data.get('style', 'vivid')
-            n = data.get('n', 1)
-            
-            images = openai_image.generate_image(
-                prompt=prompt,
-                api_key=api_key,
-                model=model,
-                size=size,
-                quality=quality,
-                style=style,
-                n=n
-            )
-        
-        elif provider == 'stability':
-            model = model or 'stable-diffusion-xl-1024-v1-0'
-            width = data.get('width', 1024)
-            height = data.get('height', 1024)
-            cfg_scale = data.get('cfg_scale', 7)
-            steps = data.get('steps', 30)
-            samples = data.get('samples', 1)
-            seed = data.get('seed')
-            
-            images = stability_ai.generate_image(
-                prompt=prompt,
-                api_key=api_key,
-                engine=model,
-                width=width,
-                height=height,
-                cfg_scale=cfg_scale,
-                steps=steps,
-                samples=samples,
-                seed=seed
-            )
+        dispatch = _DISPATCH.get(provider)
+        if not dispatch:
+            return jsonify({'error': f'Invalid provider: {provider}'}), 400
         
-        elif provider == 'replicate':
-            model = model or 'stability-ai/sdxl:latest'
-            width = data.get('width', 1024)
-            height = data.get('height', 1024)
-            replicate_params = data.get('replicate_params', {})
-            
-            result = replicate.generate_image(
-                prompt=prompt,
-                api_key=api_key,
-                model=model,
-                width=width,
-                height=height,
-                **replicate_params
-            )
-            
-            # Replicate returns a single URL or list
-            images = result if isinstance(result, list) else [result]
+        resolve_params, generate = dispatch
+        params = resolve_params(model, data)
         
+        # Opt-in: generation is non-deterministic, so a repeat normally wants new images
+        if data.get('cache') is True:
+            key = request_key(provider, prompt, api_key, params)
+            images, model = get_or_generate(key, lambda: generate(prompt, api_key, params))
         else:
-            return jsonify({'error': f'Invalid provider: {provider}'}), 400
+            images, model = generate(prompt, api_key, params)
         
         return jsonify({
             'images': images,
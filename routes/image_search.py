@@ -1,12 +1,36 @@
-from flask import Blueprint, request, jsonify
-from services.google_search import GoogleSearchService, BingSearchService
+from flask import Blueprint, request, jsonify, current_app
 from utils.validators import validate_api_key
 from utils.error_handlers import APIError
+from utils.lazy import LazyServices
 
 bp = Blueprint('image_search', __name__, url_prefix='/api')
 
-google_search = GoogleSearchService()
-bing_search = BingSearchService()
+_services = LazyServices({
+    'google_search': ('services.google_search', 'GoogleSearchService'),
+    'bing_search': ('services.google_search', 'BingSearchService'),
+})
+_get = _services.get
+
+
+def __getattr__(name):
+    if name in _services:
+        return _get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _search_google(query, api_key, num_results, data):
+    return _get('google_search').search_images(query, api_key, data.get('cse_id', '').strip(), num_results)
+
+
+def _search_bing(query, api_key, num_results, data):
+    return _get('bing_search').search_images(query, api_key, num_results)
+
+
+_DISPATCH = {
+    'google': _search_google,
+    'bing': _search_bing,
+}
+_PROVIDERS = frozenset(_DISPATCH)
 
 
 @bp.route('/search', methods=['POST'])
@@ -46,29 +70,23 @@ def search_images():
         query = data.get('query', '').strip()
         provider = data.get('provider', 'google').lower()
         api_key = data.get('api_key', '').strip()
-        num_results = min(int(data.get('num_results', 10)), 10)
+        num_results = min(int(data.get('num_results', 10)), current_app.config['MAX_SEARCH_RESULTS'])
         
         # Validate inputs
         if not query:
             return jsonify({'error': 'Search query is required'}), 400
         
-        if provider not in ['google', 'bing']:
+        if provider not in _PROVIDERS:
             return jsonify({'error': 'Invalid provider. Use "google" or "bing"'}), 400
         
         is_valid, error_msg = validate_api_key(api_key, provider)
         if not is_valid:
             return jsonify({'error': error_msg}), 401
         
-        # Perform search based on provider
-        if provider == 'google':
-            cse_id = data.get('cse_id', '').strip()
-            if not cse_id:
-                return jsonify({'error': 'Google Custom Search Engine ID (cse_id) is required'}), 400
-            
-            images = google_search.search_images(query, api_key, cse_id, num_results)
+        if provider == 'google' and not data.get('cse_id', '').strip():
+            return jsonify({'error': 'Google Custom Search Engine ID (cse_id) is required'}), 400
         
-        else:  # bing
-            images = bing_search.search_images(query, api_key, num_results)
+        images = _DISPATCH[provider](query, api_key, num_results, data)
         
         return jsonify({
             'images': images,
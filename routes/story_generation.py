@@ -1,16 +1,133 @@
-from flask import Blueprint, request, jsonify
-from werkzeug.utils import secure_filename
-import base64
-from services.llm_service import OpenAIService, AnthropicService, GoogleGeminiService, ImageProcessor
-from utils.validators import validate_image, validate_image_count, validate_api_key
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from werkzeug.exceptions import HTTPException
+import orjson
+from utils.validators import read_image, validate_image_count, validate_api_key
 from utils.error_handlers import APIError
+from utils.lazy import LazyServices
+from utils.concurrency import map_concurrently
 
 bp = Blueprint('story_generation', __name__, url_prefix='/api')
 
-openai_service = OpenAIService()
-anthropic_service = AnthropicService()
-gemini_service = GoogleGeminiService()
-image_processor = ImageProcessor()
+_services = LazyServices({
+    'openai_service': ('services.llm_service', 'OpenAIService'),
+    'anthropic_service': ('services.llm_service', 'AnthropicService'),
+    'gemini_service': ('services.llm_service', 'GoogleGeminiService'),
+    'image_processor': ('services.llm_service', 'ImageProcessor'),
+})
+_get = _services.get
+
+
+def __getattr__(name):
+    if name in _services:
+        return _get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_DEFAULT_MODEL = {
+    'openai': 'gpt-4o',
+    'anthropic': 'claude-3-5-sonnet-20241022',
+    'google': 'gemini-1.5-flash',
+}
+
+# provider -> (service name, provider-specific parameters it accepts)
+_PROVIDER_DISPATCH = {
+    'openai': ('openai_service', ()),
+    'anthropic': ('anthropic_service', ('top_k',)),
+    'google': ('gemini_service', ('top_k', 'thinking_budget')),
+}
+
+
+def _parse_story_request():
+    """
+    Parse and validate the story generation form
+    Returns: (params, error_response)
+    """
+    # Get form data
+    provider = request.form.get('provider', 'openai').lower()
+    model = request.form.get('model', '') or _DEFAULT_MODEL.get(provider)
+    api_key = request.form.get('api_key', '').strip()
+    
+    dispatch = _PROVIDER_DISPATCH.get(provider)
+    if not dispatch:
+        return None, (jsonify({'error': f'Invalid provider: {provider}'}), 400)
+    
+    # Validate API key
+    is_valid, error_msg = validate_api_key(api_key, provider)
+    if not is_valid:
+        return None, (jsonify({'error': error_msg}), 401)
+    
+    # Get parameters
+    try:
+        temperature = float(request.form.get('temperature', 1.0))
+        max_tokens = int(request.form.get('max_tokens', 1000))
+        top_p = float(request.form.get('top_p', 1.0))
+        top_k = request.form.get('top_k')
+        if top_k:
+            top_k = int(top_k)
+        thinking_budget = request.form.get('thinking_budget')
+        if thinking_budget:
+            thinking_budget = int(thinking_budget)
+    except ValueError as e:
+        return None, (jsonify({'error': f'Invalid parameter value: {str(e)}'}), 400)
+    
+    # Collect images
+    images = []
+    
+    # Process uploaded files
+    uploaded_files = request.files.getlist('files')
+    for file in uploaded_files:
+        if file.filename:
+            raw, error_msg = read_image(file)
+            if raw is None:
+                return None, (jsonify({'error': f'Invalid image: {error_msg}'}), 400)
+            
+            images.append(_get('image_processor').load_image_from_bytes(raw))
+    
+    # Process image URLs
+    image_urls = request.form.get('image_urls', '[]')
+    try:
+        urls = orjson.loads(image_urls)
+    except orjson.JSONDecodeError:
+        return None, (jsonify({'error': 'Invalid image_urls JSON'}), 400)
+    
+    if not isinstance(urls, list):
+        return None, (jsonify({'error': 'image_urls must be a JSON array'}), 400)
+    
+    # Validate image count before downloading anything
+    is_valid, error_msg = validate_image_count(len(images) + len(urls))
+    if not is_valid:
+        return None, (jsonify({'error': error_msg}), 400)
+    
+    if urls:
+        images.extend(map_concurrently(_get('image_processor').load_image_from_url, urls))
+    
+    # Process few-shot examples
+    few_shot_examples = None
+    examples_json = request.form.get('few_shot_examples', '[]')
+    try:
+        examples = orjson.loads(examples_json)
+        if examples:
+            few_shot_examples = []
+            for ex in examples[:5]:  # Limit to 5 examples
+                if 'image_base64' in ex and 'story' in ex:
+                    few_shot_examples.append(ex)
+    except orjson.JSONDecodeError:
+        return None, (jsonify({'error': 'Invalid few_shot_examples JSON'}), 400)
+    
+    service, extra_params = dispatch
+    optional = {'top_k': top_k, 'thinking_budget': thinking_budget}
+    kwargs = {
+        'images': images,
+        'api_key': api_key,
+        'model': model,
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+        'top_p': top_p,
+        'few_shot_examples': few_shot_examples,
+        **{name: optional[name] for name in extra_params}
+    }
+    
+    return {'provider': provider, 'model': model, 'service': service, 'kwargs': kwargs}, None
 
 
 @bp.route('/generate-story', methods=['POST'])
@@ -39,126 +156,16 @@ def generate_story():
     }
     """
     try:
-        # Get form data
-        provider = request.form.get('provider', 'openai').lower()
-        model = request.form.get('model', '')
-        api_key = request.form.get('api_key', '').strip()
-        
-        # Validate API key
-        is_valid, error_msg = validate_api_key(api_key, provider)
-        if not is_valid:
-            return jsonify({'error': error_msg}), 401
-        
-        # Get parameters
-        try:
-            temperature = float(request.form.get('temperature', 1.0))
-            max_tokens = int(request.form.get('max_tokens', 1000))
-            top_p = float(request.form.get('top_p', 1.0))
-            top_k = request.form.get('top_k')
-            if top_k:
-                top_k = int(top_k)
-            thinking_budget = request.form.get('thinking_budget')
-            if thinking_budget:
-                thinking_budget = int(thinking_budget)
-        except ValueError as e:
-            return jsonify({'error': f'Invalid parameter value: {str(e)}'}), 400
-        
-        # Collect images
-        images = []
-        
-        # Process uploaded files
-        uploaded_files = request.files.getlist('files')
-        for file in uploaded_files:
-            if file.filename:
-                is_valid, error_msg = validate_image(file)
-                if not is_valid:
-                    return jsonify({'error': f'Invalid image: {error_msg}'}), 400
-                
-                img = image_processor.load_image_from_file(file)
-                images.append(img)
-        
-        # Process image URLs
-        import json
-        image_urls = request.form.get('image_urls', '[]')
-        try:
-            urls = json.loads(image_urls)
-            for url in urls:
-                img = image_processor.load_image_from_url(url)
-                images.append(img)
-        except json.JSONDecodeError:
-            return jsonify({'error': 'Invalid image_urls JSON'}), 400
-        
-        # Validate image count
-        is_valid, error_msg = validate_image_count(len(images))
-        if not is_valid:
-            return jsonify({'error': error_msg}), 400
+        params, error_response = _parse_story_request()
+        if error_response:
+            return error_response
         
-        # Process few-shot examples
-        few_shot_examples = None
-        examples_json = request.form.get('few_shot_examples', '[]')
-        try:
-            examples = json.loads(examples_json)
-            if examples:
-                few_shot_examples = []
-                for ex in examples[:5]:  # Limit to 5 examples
-                    if 'image_base64' in ex and 'story' in ex:
-                        few_shot_examples.append(ex)
-        except json.JSONDecodeError:
-            return jsonify({'error': 'Invalid few_shot_examples JSON'}), 400
-        
-        # Set default models if not provided
-        if not model:
-            if provider == 'openai':
-                model = 'gpt-4o'
-            elif provider == 'anthropic':
-                model = 'claude-3-5-sonnet-20241022'
-            elif provider == 'google':
-                model = 'gemini-1.5-flash'
-        
-        # Generate story based on provider
-        if provider == 'openai':
-            story = openai_service.generate_story(
-                images=images,
-                api_key=api_key,
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=top_p,
-                few_shot_examples=few_shot_examples
-            )
-        
-        elif provider == 'anthropic':
-            story = anthropic_service.generate_story(
-                images=images,
-                api_key=api_key,
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=top_p,
-                top_k=top_k,
-                few_shot_examples=few_shot_examples
-            )
-        
-        elif provider == 'google':
-            story = gemini_service.generate_story(
-                images=images,
-                api_key=api_key,
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=top_p,
-                top_k=top_k,
-                thinking_budget=thinking_budget,
-                few_shot_examples=few_shot_examples
-            )
-        
-        else:
-            return jsonify({'error': f'Invalid provider: {provider}'}), 400
+        story = _get(params['service']).generate_story(**params['kwargs'])
         
         return jsonify({
             'story': story,
-            'provider': provider,
-            'model': model
+            'provider': params['provider'],
+            'model': params['model']
         }), 200
     
     except APIError as e:
@@ -167,7 +174,73 @@ def generate_story():
             'provider': e.provider
         }), e.status_code
     
+    except HTTPException:
+        # e.g. 413 from form parsing; leave it to the registered error handlers
+        raise
+    
     except Exception as e:
         return jsonify({
             'error': f'Story generation failed: {str(e)}'
         }), 500
+
+
+@bp.route('/generate-story-stream', methods=['POST'])
+def generate_story_stream():
+    """
+    Stream a story from images as server-sent events
+    
+    Request: same form fields as /api/generate-story
+    
+    Response (text/event-stream):
+    - data: {"text": "story chunk"} for each generated chunk
+    - event: done, data: {"provider": "openai", "model": "gpt-4o"} when finished
+    - event: error, data: {"error": "...", "provider": "..."} if generation fails mid-stream
+    
+    Validation and provider errors raised before the first chunk are
+    returned as JSON with the usual status codes.
+    """
+    try:
+        params, error_response = _parse_story_request()
+        if error_response:
+            return error_response
+        
+        chunks = _get(params['service']).generate_story_stream(**params['kwargs'])
+        first_chunk = next(chunks, None)
+    
+    except APIError as e:
+        return jsonify({
+            'error': e.message,
+            'provider': e.provider
+        }), e.status_code
+    
+    except HTTPException:
+        # e.g. 413 from form parsing; leave it to the registered error handlers
+        raise
+    
+    except Exception as e:
+        return jsonify({
+            'error': f'Story generation failed: {str(e)}'
+        }), 500
+    
+    def events():
+        try:
+            if first_chunk is not None:
+                yield _sse({'text': first_chunk})
+            for chunk in chunks:
+                yield _sse({'text': chunk})
+            yield _sse({'provider': params['provider'], 'model': params['model']}, event='done')
+        except APIError as e:
+            yield _sse({'error': e.message, 'provider': e.provider}, event='error')
+        except Exception as e:
+            yield _sse({'error': f'Story generation failed: {str(e)}'}, event='error')
+    
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _sse(data, event=None):
+    """Format a server-sent event"""
+    message = f"data: {orjson.dumps(data).decode()}\n\n"
+    return f"event: {event}\n{message}" if event else message
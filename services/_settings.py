@@ -0,0 +1,12 @@
+from config import Config
+
+# Outbound request settings (see Config)
+REQUEST_TIMEOUT = Config.REQUEST_TIMEOUT
+MAX_RETRIES = Config.MAX_RETRIES
+
+
+def init_app(app):
+    """Copy the outbound request settings from the app config"""
+    global REQUEST_TIMEOUT, MAX_RETRIES
+    REQUEST_TIMEOUT = app.config['REQUEST_TIMEOUT']
+    MAX_RETRIES = app.config['MAX_RETRIES']
@@ -1,19 +1,49 @@
+import hashlib
+import threading
+import orjson
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from flask import current_app
-from utils.error_handlers import APIError
+from cachetools import TTLCache
+from utils.error_handlers import APIError, raise_for_http
+from utils.concurrency import map_concurrently
+from services import _settings
+from services.http import SESSION, with_retries
 
 
-class GoogleSearchService:
+class BaseSearchService:
+    """Base class for image search services"""
+    
+    _session = SESSION
+    
+    # Successful responses are shared across requests for a short time;
+    # errors propagate as exceptions and are never stored.
+    _cache = TTLCache(maxsize=1024, ttl=300)
+    _cache_lock = threading.Lock()
+    
+    def _cached(self, key, fetch):
+        """Return the cached result for key, calling fetch() on a miss"""
+        key = (type(self).__name__, *key)
+        with self._cache_lock:
+            result = self._cache.get(key)
+        if result is None:
+            result = fetch()
+            with self._cache_lock:
+                self._cache[key] = result
+        return result
+    
+    @staticmethod
+    def _key_digest(api_key):
+        """Hash API keys so they are never held in the cache"""
+        return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class GoogleSearchService(BaseSearchService):
     """Google Custom Search API integration"""
     
     BASE_URL = "https://www.googleapis.com/customsearch/v1"
+    FIELDS = "items(link,title,image(thumbnailLink,width,height))"
+    PAGE_SIZE = 10
+    MAX_RESULTS = 100
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type(requests.exceptions.RequestException)
-    )
     def search_images(self, query, api_key, cse_id, num_results=10):
         """
         Search for images using Google Custom Search API
@@ -22,67 +52,79 @@ class GoogleSearchService:
             query: Search query string
             api_key: Google API key
             cse_id: Custom Search Engine ID
-            num_results: Number of results (max 10 per request)
+            num_results: Number of results (fetched in parallel pages of 10, max 100)
         
         Returns:
             List of image URLs
         """
+        return self._cached(
+            (query, self._key_digest(api_key), cse_id, num_results),
+            lambda: self._search(query, api_key, cse_id, num_results)
+        )
+    
+    def _search(self, query, api_key, cse_id, num_results):
         try:
             params = {
                 'key': api_key,
                 'cx': cse_id,
                 'q': query,
                 'searchType': 'image',
-                'num': min(num_results, 10),
-                'safe': 'active'
+                'safe': 'active',
+                'fields': self.FIELDS
             }
             
-            response = requests.get(
-                self.BASE_URL,
-                params=params,
-                timeout=current_app.config['REQUEST_TIMEOUT']
-            )
-            
-            if response.status_code == 401:
-                raise APIError("Invalid Google API key", 401, "Google")
-            elif response.status_code == 429:
-                raise APIError("Google API quota exceeded", 429, "Google")
-            elif response.status_code != 200:
-                raise APIError(f"Google API error: {response.text}", response.status_code, "Google")
+            num_results = max(1, min(num_results, self.MAX_RESULTS))
+            pages = [
+                {**params, 'start': start, 'num': min(self.PAGE_SIZE, num_results - start + 1)}
+                for start in range(1, num_results + 1, self.PAGE_SIZE)
+            ]
+            results = map_concurrently(self._fetch_page, pages)
             
-            data = response.json()
-            
-            if 'items' not in data:
-                return []
-            
-            images = []
-            for item in data['items']:
-                images.append({
-                    'url': item['link'],
-                    'thumbnail': item.get('image', {}).get('thumbnailLink', item['link']),
-                    'title': item.get('title', ''),
-                    'width': item.get('image', {}).get('width'),
-                    'height': item.get('image', {}).get('height')
-                })
-            
-            return images
+            return [
+                self._to_result(item)
+                for data in results
+                for item in data.get('items', ())
+            ]
             
         except requests.exceptions.Timeout:
             raise APIError("Google API request timeout", 408, "Google")
         except requests.exceptions.RequestException as e:
             raise APIError(f"Google API request failed: {str(e)}", 500, "Google")
+    
+    @staticmethod
+    def _to_result(item):
+        image = item.get('image') or {}
+        return {
+            'url': item['link'],
+            'thumbnail': image.get('thumbnailLink', item['link']),
+            'title': item.get('title', ''),
+            'width': image.get('width'),
+            'height': image.get('height')
+        }
+    
+    def _fetch_page(self, params):
+        """Fetch a single page of search results"""
+        response = with_retries(
+            self._session.get,
+            self.BASE_URL,
+            params=params,
+            timeout=_settings.REQUEST_TIMEOUT,
+            attempts=_settings.MAX_RETRIES
+        )
+        
+        raise_for_http(response, "Google", {
+            401: "Invalid Google API key",
+            429: "Google API quota exceeded"
+        })
+        
+        return orjson.loads(response.content)
 
 
-class BingSearchService:
+class BingSearchService(BaseSearchService):
     """Bing Image Search API integration"""
     
     BASE_URL = "https://api.bing.microsoft.com/v7.0/images/search"
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type(requests.exceptions.RequestException)
-    )
     def search_images(self, query, api_key, num_results=10):
         """
         Search for images using Bing Image Search API
@@ -95,6 +137,12 @@ class BingSearchService:
         Returns:
             List of image URLs
         """
+        return self._cached(
+            (query, self._key_digest(api_key), num_results),
+            lambda: self._search(query, api_key, num_results)
+        )
+    
+    def _search(self, query, api_key, num_results):
         try:
             headers = {
                 'Ocp-Apim-Subscription-Key': api_key
@@ -106,36 +154,32 @@ class BingSearchService:
                 'safeSearch': 'Moderate'
             }
             
-            response = requests.get(
+            response = with_retries(
+                self._session.get,
                 self.BASE_URL,
                 headers=headers,
                 params=params,
-                timeout=current_app.config['REQUEST_TIMEOUT']
+                timeout=_settings.REQUEST_TIMEOUT,
+                attempts=_settings.MAX_RETRIES
             )
             
-            if response.status_code == 401:
-                raise APIError("Invalid Bing API key", 401, "Bing")
-            elif response.status_code == 429:
-                raise APIError("Bing API quota exceeded", 429, "Bing")
-            elif response.status_code != 200:
-                raise APIError(f"Bing API error: {response.text}", response.status_code, "Bing")
+            raise_for_http(response, "Bing", {
+                401: "Invalid Bing API key",
+                429: "Bing API quota exceeded"
+            })
             
-            data = response.json()
+            data = orjson.loads(response.content)
             
-            if 'value' not in data:
-                return []
-            
-            images = []
-            for item in data['value']:
-                images.append({
+            return [
+                {
                     'url': item['contentUrl'],
                     'thumbnail': item['thumbnailUrl'],
                     'title': item.get('name', ''),
                     'width': item.get('width'),
                     'height': item.get('height')
-                })
-            
-            return images
+                }
+                for item in data.get('value', ())
+            ]
             
         except requests.exceptions.Timeout:
             raise APIError("Bing API request timeout", 408, "Bing")
@@ -0,0 +1,99 @@
+from http.cookiejar import DefaultCookiePolicy
+import random
+import socket
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+# TCP keepalive probes stop idle pooled connections from being silently
+# dropped by NATs/load balancers, which would force a fresh TLS handshake
+_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+if hasattr(socket, 'TCP_KEEPIDLE'):
+    _SOCKET_OPTIONS += [
+        (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 15),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 4),
+    ]
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled sockets send TCP keepalive probes"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault('socket_options', _SOCKET_OPTIONS)
+        super().init_poolmanager(*args, **kwargs)
+
+
+def build_session(pool_connections=10, pool_maxsize=50):
+    """Create a keep-alive session with a pooled HTTPS adapter"""
+    session = requests.Session()
+    # The session is shared across users and arbitrary image hosts; never
+    # store cookies, so none are replayed on another caller's request
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    session.mount('https://', KeepAliveAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize))
+    session.headers.update({'Accept-Encoding': 'gzip'})
+    return session
+
+
+# Statuses worth retrying; anything else (400/401/403/...) is returned as-is
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+BACKOFF_BASE = 0.5
+MAX_BACKOFF = 10
+
+
+def with_retries(fn, *args, attempts=3, **kwargs):
+    """
+    Call fn, retrying transient failures with jittered exponential backoff
+    
+    Connection errors, timeouts, 429 and 5xx responses are retried. A
+    Retry-After header is honoured when it fits within MAX_BACKOFF;
+    longer waits return the response so the caller can report it.
+    
+    Returns:
+        The last response from fn
+    """
+    attempts = max(1, attempts)
+    for attempt in range(attempts):
+        last_attempt = attempt == attempts - 1
+        try:
+            response = fn(*args, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if last_attempt:
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+        
+        if last_attempt or response.status_code not in RETRY_STATUS_CODES:
+            return response
+        
+        delay = _backoff(attempt)
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            if retry_after > MAX_BACKOFF:
+                return response
+            delay = max(delay, retry_after)
+        response.close()
+        time.sleep(delay)
+
+
+def _backoff(attempt):
+    return min(MAX_BACKOFF, BACKOFF_BASE * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def _retry_after(response):
+    """Seconds the server asked us to wait, if it said so in a usable form"""
+    headers = response.headers
+    try:
+        if 'retry-after-ms' in headers:
+            return float(headers['retry-after-ms']) / 1000
+        if 'Retry-After' in headers:
+            return max(0.0, float(headers['Retry-After']))
+    except ValueError:  # HTTP-date form; fall back to our own backoff
+        pass
+    return None
+
+
+# Process-wide client shared by the outbound API services; connections are
+# pooled per host, so one session serves every provider.
+SESSION = build_session()
@@ -1,20 +1,36 @@
+from functools import partial
+import orjson
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential
-from flask import current_app
-from utils.error_handlers import APIError
+from utils.error_handlers import APIError, raise_for_http
+from utils.concurrency import map_concurrently
+from services import _settings
+from services.http import SESSION, with_retries
+
+
+def _generate_batch(generate, prompts, count_param, max_count, provider):
+    """
+    Generate one image per prompt, in a single call when every prompt is the same
+    
+    Other batches run at most max_count provider requests at a time.
+    Returns: List of image lists, one per prompt
+    """
+    if prompts and len(prompts) <= max_count and len(set(prompts)) == 1:
+        images = generate(prompts[0], **{count_param: len(prompts)})
+        if len(images) != len(prompts):
+            raise APIError(f"Expected {len(prompts)} images, received {len(images)}", 500, provider)
+        return [[image] for image in images]
+    return map_concurrently(generate, prompts, max_workers=max_count)
 
 
 class OpenAIImageService:
     """OpenAI DALL-E API integration"""
     
     BASE_URL = "https://api.openai.com/v1/images/generations"
+    _session = SESSION
+    MAX_IMAGES = 10
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
     def generate_image(self, prompt, api_key, model="dall-e-3", size="1024x1024",
-                      quality="standard", style="vivid", n=1):
+                      quality="standard", style="vivid", n=1, fan_out=False):
         """
         Generate image using DALL-E
         
@@ -25,7 +41,9 @@ class OpenAIImageService:
             size: Image size (1024x1024, 1792x1024, 1024x1792 for DALL-E 3)
             quality: standard or hd (DALL-E 3 only)
             style: vivid or natural (DALL-E 3 only)
-            n: Number of images (1 for DALL-E 3, 1-10 for DALL-E 2)
+            n: Number of images (1-10 for DALL-E 2; DALL-E 3 returns 1 unless fan_out)
+            fan_out: For DALL-E 3, send n separate (separately billed) n=1
+                requests concurrently
         
         Returns:
             List of image URLs
@@ -36,6 +54,7 @@ class OpenAIImageService:
                 "Content-Type": "application/json"
             }
             
+            n = max(1, min(int(n), self.MAX_IMAGES))
             payload = {
                 "model": model,
                 "prompt": prompt,
@@ -48,25 +67,11 @@ class OpenAIImageService:
                 payload["quality"] = quality
                 payload["style"] = style
             
-            response = requests.post(
-                self.BASE_URL,
-                headers=headers,
-                json=payload,
-                timeout=current_app.config['REQUEST_TIMEOUT'] * 3  # Image gen takes longer
-            )
-            
-            if response.status_code == 401:
-                raise APIError("Invalid OpenAI API key", 401, "OpenAI DALL-E")
-            elif response.status_code == 429:
-                raise APIError("OpenAI API rate limit exceeded", 429, "OpenAI DALL-E")
-            elif response.status_code == 400:
-                error_msg = response.json().get('error', {}).get('message', response.text)
-                raise APIError(f"DALL-E error: {error_msg}", 400, "OpenAI DALL-E")
-            elif response.status_code != 200:
-                raise APIError(f"DALL-E API error: {response.text}", response.status_code, "OpenAI DALL-E")
-            
-            data = response.json()
-            return [img['url'] for img in data['data']]
+            # DALL-E 3 only accepts n=1; extra images cost extra requests, so
+            # they are only made when the caller asks for them
+            calls = n if fan_out and model == "dall-e-3" else 1
+            batches = map_concurrently(lambda _: self._request_images(headers, payload), range(calls))
+            return [url for batch in batches for url in batch]
             
         except requests.exceptions.Timeout:
             raise APIError("DALL-E API request timeout", 408, "OpenAI DALL-E")
@@ -74,17 +79,53 @@ class OpenAIImageService:
             raise
         except Exception as e:
             raise APIError(f"DALL-E request failed: {str(e)}", 500, "OpenAI DALL-E")
+    
+    def generate_batch(self, prompts, api_key, **kwargs):
+        """
+        Generate one image for each prompt
+        
+        Identical prompts are sent as one request for n images; distinct
+        prompts are generated concurrently, up to MAX_IMAGES at a time.
+        
+        Args:
+            prompts: List of text descriptions
+            api_key: OpenAI API key
+            **kwargs: generate_image parameters other than n
+        
+        Returns:
+            List of image URL lists, one per prompt
+        """
+        # The caller asked for one image per prompt, so DALL-E 3 may fan out
+        generate = partial(self.generate_image, api_key=api_key, fan_out=True, **kwargs)
+        return _generate_batch(generate, prompts, 'n', self.MAX_IMAGES, "OpenAI DALL-E")
+    
+    def _request_images(self, headers, payload):
+        """Send one generation request and return its image URLs"""
+        response = with_retries(
+            self._session.post,
+            self.BASE_URL,
+            headers=headers,
+            data=orjson.dumps(payload),
+            timeout=_settings.REQUEST_TIMEOUT * 3,  # Image gen takes longer
+            attempts=_settings.MAX_RETRIES
+        )
+        
+        raise_for_http(response, "OpenAI DALL-E", {
+            401: "Invalid OpenAI API key",
+            429: "OpenAI API rate limit exceeded"
+        }, label="DALL-E error")
+        
+        data = orjson.loads(response.content)
+        return [img['url'] for img in data['data']]
 
 
 class StabilityAIService:
     """Stability AI (Stable Diffusion) API integration"""
     
     BASE_URL = "https://api.stability.ai/v1/generation"
+    MAX_SAMPLES = 10
+    _session = SESSION
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
     def generate_image(self, prompt, api_key, engine="stable-diffusion-xl-1024-v1-0",
                       width=1024, height=1024, cfg_scale=7, steps=30, samples=1, seed=None):
         """
@@ -130,21 +171,21 @@ class StabilityAIService:
             
             url = f"{self.BASE_URL}/{engine}/text-to-image"
             
-            response = requests.post(
+            response = with_retries(
+                self._session.post,
                 url,
                 headers=headers,
-                json=payload,
-                timeout=current_app.config['REQUEST_TIMEOUT'] * 3
+                data=orjson.dumps(payload),
+                timeout=_settings.REQUEST_TIMEOUT * 3,
+                attempts=_settings.MAX_RETRIES
             )
             
-            if response.status_code == 401:
-                raise APIError("Invalid Stability AI API key", 401, "Stability AI")
-            elif response.status_code == 429:
-                raise APIError("Stability AI rate limit exceeded", 429, "Stability AI")
-            elif response.status_code != 200:
-                raise APIError(f"Stability AI error: {response.text}", response.status_code, "Stability AI")
+            raise_for_http(response, "Stability AI", {
+                401: "Invalid Stability AI API key",
+                429: "Stability AI rate limit exceeded"
+            }, label="Stability AI error")
             
-            data = response.json()
+            data = orjson.loads(response.content)
             return [img['base64'] for img in data['artifacts']]
             
         except requests.exceptions.Timeout:
@@ -153,17 +194,35 @@ class StabilityAIService:
             raise
         except Exception as e:
             raise APIError(f"Stability AI request failed: {str(e)}", 500, "Stability AI")
+    
+    def generate_batch(self, prompts, api_key, **kwargs):
+        """
+        Generate one image for each prompt
+        
+        Identical prompts are sent as one request for that many samples;
+        distinct prompts are generated concurrently, up to MAX_SAMPLES at a
+        time.
+        
+        Args:
+            prompts: List of text descriptions
+            api_key: Stability AI API key
+            **kwargs: generate_image parameters other than samples
+        
+        Returns:
+            List of base64 image lists, one per prompt
+        """
+        generate = partial(self.generate_image, api_key=api_key, **kwargs)
+        return _generate_batch(generate, prompts, 'samples', self.MAX_SAMPLES, "Stability AI")
 
 
 class ReplicateService:
     """Replicate API integration for various image generation models"""
     
     BASE_URL = "https://api.replicate.com/v1/predictions"
+    # Seconds Replicate may hold the create request open for the result (max 60)
+    SYNC_WAIT = 60
+    _session = SESSION
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
     def generate_image(self, prompt, api_key, model="stability-ai/sdxl:latest",
                       width=1024, height=1024, **kwargs):
         """
@@ -178,7 +237,7 @@ class ReplicateService:
             **kwargs: Additional model-specific parameters
         
         Returns:
-            Image URL (after polling for completion)
+            Image URL (once the prediction has finished)
         """
         try:
             headers = {
@@ -198,45 +257,47 @@ class ReplicateService:
                 "input": input_params
             }
             
-            # Create prediction
-            response = requests.post(
+            # Create prediction, letting Replicate answer once it has finished
+            response = with_retries(
+                self._session.post,
                 self.BASE_URL,
-                headers=headers,
-                json=payload,
-                timeout=current_app.config['REQUEST_TIMEOUT']
+                headers={**headers, "Prefer": f"wait={self.SYNC_WAIT}"},
+                data=orjson.dumps(payload),
+                timeout=_settings.REQUEST_TIMEOUT + self.SYNC_WAIT,
+                attempts=_settings.MAX_RETRIES
             )
             
-            if response.status_code == 401:
-                raise APIError("Invalid Replicate API key", 401, "Replicate")
-            elif response.status_code == 429:
-                raise APIError("Replicate rate limit exceeded", 429, "Replicate")
-            elif response.status_code not in (200, 201):
-                raise APIError(f"Replicate error: {response.text}", response.status_code, "Replicate")
+            raise_for_http(response, "Replicate", {
+                401: "Invalid Replicate API key",
+                429: "Replicate rate limit exceeded"
+            }, label="Replicate error", ok_codes=(200, 201))
             
-            prediction = response.json()
+            prediction = orjson.loads(response.content)
+            output = self._finished_output(prediction)
+            if output is not None:
+                return output
             prediction_id = prediction['id']
             
-            # Poll for completion (simplified - in production, use webhooks)
+            # Still running after the server-side wait; fall back to polling
             import time
             max_attempts = 30
             for _ in range(max_attempts):
                 time.sleep(2)
                 
-                status_response = requests.get(
+                status_response = with_retries(
+                    self._session.get,
                     f"{self.BASE_URL}/{prediction_id}",
                     headers=headers,
-                    timeout=current_app.config['REQUEST_TIMEOUT']
+                    timeout=_settings.REQUEST_TIMEOUT,
+                    attempts=_settings.MAX_RETRIES
                 )
                 
                 if status_response.status_code != 200:
                     raise APIError("Failed to check prediction status", status_response.status_code, "Replicate")
                 
-                status_data = status_response.json()
-                
-                if status_data['status'] == 'succeeded':
-                    return status_data['output']
-                elif status_data['status'] == 'failed':
-                    raise APIError("Image generation failed", 500, "Replicate")
+                output = self._finished_output(orjson.loads(status_response.content))
+                if output is not None:
+                    return output
             
             raise APIError("Image generation timeout", 408, "Replicate")
             
@@ -246,3 +307,13 @@ class ReplicateService:
             raise
         except Exception as e:
             raise APIError(f"Replicate request failed: {str(e)}", 500, "Replicate")
+    
+    @staticmethod
+    def _finished_output(prediction):
+        """Return the output of a succeeded prediction, or None while it is still running"""
+        status = prediction.get('status')
+        if status == 'succeeded':
+            return prediction['output']
+        elif status in ('failed', 'canceled'):
+            raise APIError("Image generation failed", 500, "Replicate")
+        return None
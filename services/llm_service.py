@@ -1,15 +1,46 @@
-import base64
+import hashlib
 import io
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+import pybase64
 import requests
+from cachetools import TTLCache
 from PIL import Image
-from tenacity import retry, stop_after_attempt, wait_exponential
-from flask import current_app
-from utils.error_handlers import APIError
+from utils.error_handlers import APIError, raise_for_http
+from services import _settings
+from services.http import SESSION, with_retries
+
+try:
+    import pyvips
+    # libvips logs every operation at INFO, which the app's basicConfig would print
+    logging.getLogger('pyvips').setLevel(logging.WARNING)
+    # Drop EXIF/XMP/ICC on save, as Pillow does; libvips 8.15 replaced strip with keep
+    _VIPS_NO_METADATA = ({'keep': pyvips.enums.ForeignKeep.NONE} if pyvips.at_least_libvips(8, 15)
+                         else {'strip': True})
+except (ImportError, OSError):  # libvips is optional; Pillow handles everything without it
+    pyvips = None
 
 
 class ImageProcessor:
     """Utility for processing images before sending to APIs"""
     
+    PASSTHROUGH_MIME_TYPES = {'image/jpeg', 'image/png', 'image/webp'}
+    # Largest upload sent unchanged; keeps the base64 payload under 5MB
+    MAX_PASSTHROUGH_BYTES = 3932160
+    # Image.info keys for EXIF/XMP (camera, GPS); images carrying them are re-encoded without
+    METADATA_KEYS = frozenset({'exif', 'xmp', 'XML:com.adobe.xmp'})
+    # Formats Image.open probes for; anything else is rejected up front
+    OPEN_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+    
+    # Resized images by content digest, bounded by total base64 size (64MB);
+    # entries expire so uploaded photos are not held for the process lifetime
+    _encoded_cache = TTLCache(maxsize=64 * 1024 * 1024, ttl=600, getsizeof=lambda entry: len(entry[0]))
+    _encoded_lock = threading.Lock()
+    
     @staticmethod
     def resize_image(image, max_size=(2048, 2048)):
         """Resize image if it exceeds max dimensions"""
@@ -25,46 +56,149 @@ class ImageProcessor:
         # Convert RGBA to RGB if saving as JPEG
         if format.upper() == 'JPEG' and image.mode in ('RGBA', 'LA', 'P'):
             rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            rgb_image.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
-            image = rgb_image
+            source = image.convert('RGBA') if image.mode == 'P' else image
+            rgb_image.paste(source, mask=source.split()[-1] if source.mode in ('RGBA', 'LA') else None)
+            if source is not image:
+                source.close()
+            # Intermediate copy; free its pixel buffer as soon as it is written
+            with rgb_image:
+                rgb_image.save(buffered, format=format, quality=85)
+        else:
+            image.save(buffered, format=format, quality=85)
+        # Encode straight from the buffer instead of copying it out with getvalue()
+        with buffered.getbuffer() as img_bytes:
+            return pybase64.b64encode_as_string(img_bytes)
+    
+    @classmethod
+    def encode_image(cls, source, max_size=(2048, 2048)):
+        """
+        Base64-encode an image for a vision API request
+        
+        Uploads that are already in a supported format, within size
+        limits and free of EXIF/XMP metadata are sent as-is; anything
+        else is resized and re-encoded as JPEG, which drops the metadata.
+        
+        Args:
+            source: (bytes, mime type) tuple
+            max_size: Maximum (width, height)
+        
+        Returns:
+            (base64 string, mime type)
+        """
+        data, mime = source
+        with Image.open(io.BytesIO(data)) as image:
+            if (mime in cls.PASSTHROUGH_MIME_TYPES and len(data) <= cls.MAX_PASSTHROUGH_BYTES
+                    and image.width <= max_size[0] and image.height <= max_size[1]
+                    and cls.METADATA_KEYS.isdisjoint(image.info)):
+                return pybase64.b64encode_as_string(data), mime
+            
+            # Only a resize is worth caching; hashing costs more than a plain base64 encode
+            key = cls._content_key(data, max_size)
+            with cls._encoded_lock:
+                encoded = cls._encoded_cache.get(key)
+            if encoded is None:
+                encoded = cls._resize_and_encode(image, data, max_size)
+                with cls._encoded_lock:
+                    cls._encoded_cache[key] = encoded
+            return encoded
+    
+    @staticmethod
+    def _content_key(data, max_size):
+        """BLAKE2b digest of the image bytes and target size"""
+        digest = hashlib.blake2b(repr(max_size).encode(), digest_size=16)
+        digest.update(data)
+        return digest.digest()
+    
+    @classmethod
+    def _resize_and_encode(cls, image, data, max_size):
+        """Resize and JPEG-encode an opened image; returns (base64 string, mime type)"""
+        if pyvips is not None:
+            return pybase64.b64encode_as_string(cls._resize_and_encode_vips(data, max_size)), 'image/jpeg'
         
-        image.save(buffered, format=format, quality=85)
-        img_bytes = buffered.getvalue()
-        return base64.b64encode(img_bytes).decode('utf-8')
+        resized = cls.resize_image(image, max_size)
+        return cls.image_to_base64(resized, 'JPEG'), 'image/jpeg'
     
     @staticmethod
-    def load_image_from_url(url, timeout=10):
-        """Download and load image from URL"""
+    def _resize_and_encode_vips(data, max_size):
+        """Shrink-on-load and JPEG-encode image bytes with libvips"""
+        image = pyvips.Image.thumbnail_buffer(data, max_size[0], height=max_size[1], size='down')
+        if image.hasalpha():
+            image = image.flatten(background=[255, 255, 255])
+        if image.interpretation not in ('srgb', 'b-w'):
+            image = image.colourspace('srgb')
+        return image.jpegsave_buffer(Q=85, **_VIPS_NO_METADATA)
+    
+    @classmethod
+    def load_image_from_bytes(cls, data):
+        """
+        Identify an in-memory image from its header, without decoding it
+        Returns: (bytes, mime type)
+        """
         try:
-            response = requests.get(url, timeout=timeout, stream=True)
-            response.raise_for_status()
-            return Image.open(io.BytesIO(response.content))
+            image = Image.open(io.BytesIO(data), formats=cls.OPEN_FORMATS)
         except Exception as e:
-            raise APIError(f"Failed to load image from URL: {str(e)}", 400)
+            raise APIError(f"Failed to load image: {str(e)}", 400)
+        
+        with image:
+            # Image.open only raises for bombs over twice the limit; refuse anything over it
+            if image.width * image.height > Image.MAX_IMAGE_PIXELS:
+                raise APIError(f"Image too large: {image.width}x{image.height} pixels", 400)
+            return data, Image.MIME.get(image.format, 'image/jpeg')
     
-    @staticmethod
-    def load_image_from_file(file_storage):
-        """Load image from Flask file storage"""
+    @classmethod
+    def load_image_from_url(cls, url, timeout=10):
+        """Download image from URL; returns (bytes, mime type)"""
         try:
-            return Image.open(file_storage.stream)
+            with SESSION.get(url, timeout=timeout, stream=True) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                buffered = io.BytesIO()
+                shutil.copyfileobj(response.raw, buffered, 65536)
+            return cls.load_image_from_bytes(buffered.getvalue())
         except Exception as e:
-            raise APIError(f"Failed to load image from file: {str(e)}", 400)
+            raise APIError(f"Failed to load image from URL: {str(e)}", 400)
 
 
 class BaseLLMService:
     """Base class for LLM services"""
     
+    # Keep-alive connections are reused across requests and API keys
+    _session = SESSION
+    # Pillow releases the GIL while resizing and encoding, so images encode in parallel
+    _encode_pool = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix='encode')
+    # Text parts for few-shot and current turns; shared by every payload, so never mutated
+    _FEW_SHOT_PROMPT = {"type": "text", "text": "Generate a creative story based on this image."}
+    _CURRENT_PROMPT = {"type": "text", "text": "Generate a creative story based on these images."}
+    
     def __init__(self):
         self.image_processor = ImageProcessor()
     
+    def _encode_images(self, images):
+        """
+        Encode request images for the API payload
+        Returns: List of (base64 string, mime type) in input order
+        """
+        if len(images) <= 1:
+            return [self.image_processor.encode_image(img) for img in images]
+        return list(self._encode_pool.map(self.image_processor.encode_image, images))
+    
     def prepare_few_shot_examples(self, examples, api_format):
         """
         Convert few-shot examples to API-specific format
         Must be implemented by subclasses
         """
         raise NotImplementedError
+    
+    @staticmethod
+    def _iter_sse_data(response):
+        """Yield decoded JSON payloads from a server-sent events stream"""
+        for line in response.iter_lines():
+            if not line.startswith(b'data:'):
+                continue
+            data = line[5:].strip()
+            if data == b'[DONE]':
+                return
+            yield orjson.loads(data)
 
 
 class OpenAIService(BaseLLMService):
@@ -72,17 +206,13 @@ class OpenAIService(BaseLLMService):
     
     BASE_URL = "https://api.openai.com/v1/chat/completions"
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
     def generate_story(self, images, api_key, model="gpt-4o", temperature=1.0, 
                       max_tokens=1000, top_p=1.0, few_shot_examples=None):
         """
         Generate story from images using OpenAI Vision API
         
         Args:
-            images: List of PIL Image objects
+            images: List of (bytes, mime type) tuples or PIL Image objects
             api_key: OpenAI API key
             model: Model name (gpt-4o, gpt-4o-mini, etc.)
             temperature: 0.0-2.0
@@ -94,76 +224,63 @@ class OpenAIService(BaseLLMService):
             Generated story text
         """
         try:
-            # Prepare messages
-            messages = []
+            payload = self._build_payload(images, model, temperature, max_tokens, top_p, few_shot_examples)
             
-            # Add few-shot examples
-            if few_shot_examples:
-                for example in few_shot_examples[:5]:  # Limit to 5 examples
-                    user_content = [
-                        {"type": "text", "text": "Generate a creative story based on this image."}
-                    ]
-                    
-                    # Add example image
-                    if 'image_base64' in example:
-                        user_content.append({
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{example['image_base64']}"
-                            }
-                        })
-                    
-                    messages.append({"role": "user", "content": user_content})
-                    messages.append({"role": "assistant", "content": example['story']})
-            
-            # Add current request
-            user_content = [
-                {"type": "text", "text": "Generate a creative story based on these images."}
-            ]
-            
-            for img in images:
-                resized = self.image_processor.resize_image(img)
-                b64_img = self.image_processor.image_to_base64(resized, 'JPEG')
-                user_content.append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{b64_img}"
-                    }
-                })
+            response = with_retries(
+                self._session.post,
+                self.BASE_URL,
+                headers=self._headers(api_key),
+                data=orjson.dumps(payload),
+                timeout=_settings.REQUEST_TIMEOUT * 2,  # Vision takes longer
+                attempts=_settings.MAX_RETRIES
+            )
             
-            messages.append({"role": "user", "content": user_content})
+            self._check_response(response)
             
-            # Make API request
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
+            data = orjson.loads(response.content)
+            return data['choices'][0]['message']['content']
             
-            payload = {
-                "model": model,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-                "top_p": top_p
-            }
+        except requests.exceptions.Timeout:
+            raise APIError("OpenAI API request timeout", 408, "OpenAI")
+        except APIError:
+            raise
+        except Exception as e:
+            raise APIError(f"OpenAI request failed: {str(e)}", 500, "OpenAI")
+    
+    def generate_story_stream(self, images, api_key, model="gpt-4o", temperature=1.0,
+                              max_tokens=1000, top_p=1.0, few_shot_examples=None):
+        """
+        Stream a story from images using OpenAI Vision API
+        
+        Args:
+            Same as generate_story
+        
+        Yields:
+            Chunks of generated story text
+        """
+        try:
+            payload = self._build_payload(images, model, temperature, max_tokens, top_p, few_shot_examples)
+            payload["stream"] = True
             
-            response = requests.post(
+            response = with_retries(
+                self._session.post,
                 self.BASE_URL,
-                headers=headers,
-                json=payload,
-                timeout=current_app.config['REQUEST_TIMEOUT'] * 2  # Vision takes longer
+                headers=self._headers(api_key),
+                data=orjson.dumps(payload),
+                timeout=_settings.REQUEST_TIMEOUT * 2,
+                stream=True,
+                attempts=_settings.MAX_RETRIES
             )
             
-            if response.status_code == 401:
-                raise APIError("Invalid OpenAI API key", 401, "OpenAI")
-            elif response.status_code == 429:
-                raise APIError("OpenAI API rate limit exceeded", 429, "OpenAI")
-            elif response.status_code != 200:
-                error_msg = response.json().get('error', {}).get('message', response.text)
-                raise APIError(f"OpenAI API error: {error_msg}", response.status_code, "OpenAI")
-            
-            data = response.json()
-            return data['choices'][0]['message']['content']
+            with response:
+                self._check_response(response)
+                
+                for event in self._iter_sse_data(response):
+                    choices = event.get('choices')
+                    if choices:
+                        text = choices[0].get('delta', {}).get('content')
+                        if text:
+                            yield text
             
         except requests.exceptions.Timeout:
             raise APIError("OpenAI API request timeout", 408, "OpenAI")
@@ -171,6 +288,56 @@ class OpenAIService(BaseLLMService):
             raise
         except Exception as e:
             raise APIError(f"OpenAI request failed: {str(e)}", 500, "OpenAI")
+    
+    def _build_payload(self, images, model, temperature, max_tokens, top_p, few_shot_examples):
+        """Build the chat completions request body"""
+        # Prepare messages
+        messages = []
+        
+        # Add few-shot examples
+        if few_shot_examples:
+            for example in few_shot_examples[:5]:  # Limit to 5 examples
+                user_content = [self._FEW_SHOT_PROMPT]
+                
+                # Add example image
+                if 'image_base64' in example:
+                    user_content.append(self._image_part(example['image_base64'], 'image/jpeg'))
+                
+                messages.append({"role": "user", "content": user_content})
+                messages.append({"role": "assistant", "content": example['story']})
+        
+        # Add current request
+        user_content = [self._CURRENT_PROMPT]
+        user_content.extend(self._image_part(b64_img, mime) for b64_img, mime in self._encode_images(images))
+        
+        messages.append({"role": "user", "content": user_content})
+        
+        return {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "top_p": top_p
+        }
+    
+    @staticmethod
+    def _image_part(b64_img, mime):
+        return {"type": "image_url", "image_url": {"url": f"data:{mime};base64,{b64_img}"}}
+    
+    @staticmethod
+    def _headers(api_key):
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    @staticmethod
+    def _check_response(response):
+        """Map non-200 responses to APIError"""
+        raise_for_http(response, "OpenAI", {
+            401: "Invalid OpenAI API key",
+            429: "OpenAI API rate limit exceeded"
+        })
 
 
 class AnthropicService(BaseLLMService):
@@ -179,10 +346,6 @@ class AnthropicService(BaseLLMService):
     BASE_URL = "https://api.anthropic.com/v1/messages"
     API_VERSION = "2023-06-01"
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
     def generate_story(self, images, api_key, model="claude-3-5-sonnet-20241022", 
                       temperature=1.0, max_tokens=1000, top_p=1.0, top_k=None,
                       few_shot_examples=None):
@@ -190,7 +353,7 @@ class AnthropicService(BaseLLMService):
         Generate story from images using Claude Vision API
         
         Args:
-            images: List of PIL Image objects
+            images: List of (bytes, mime type) tuples or PIL Image objects
             api_key: Anthropic API key
             model: Model name (claude-3-opus, claude-3-sonnet, claude-3-haiku)
             temperature: 0.0-1.0
@@ -203,83 +366,66 @@ class AnthropicService(BaseLLMService):
             Generated story text
         """
         try:
-            # Prepare messages
-            messages = []
-            
-            # Add few-shot examples
-            if few_shot_examples:
-                for example in few_shot_examples[:5]:
-                    user_content = [
-                        {"type": "text", "text": "Generate a creative story based on this image."}
-                    ]
-                    
-                    if 'image_base64' in example:
-                        user_content.append({
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": "image/jpeg",
-                                "data": example['image_base64']
-                            }
-                        })
-                    
-                    messages.append({"role": "user", "content": user_content})
-                    messages.append({"role": "assistant", "content": example['story']})
+            payload = self._build_payload(images, model, temperature, max_tokens, top_p, top_k, few_shot_examples)
             
-            # Add current request
-            user_content = [
-                {"type": "text", "text": "Generate a creative story based on these images."}
-            ]
-            
-            for img in images:
-                resized = self.image_processor.resize_image(img)
-                b64_img = self.image_processor.image_to_base64(resized, 'JPEG')
-                user_content.append({
-                    "type": "image",
-                    "source": {
-                        "type": "base64",
-                        "media_type": "image/jpeg",
-                        "data": b64_img
-                    }
-                })
-            
-            messages.append({"role": "user", "content": user_content})
+            response = with_retries(
+                self._session.post,
+                self.BASE_URL,
+                headers=self._headers(api_key),
+                data=orjson.dumps(payload),
+                timeout=_settings.REQUEST_TIMEOUT * 2,
+                attempts=_settings.MAX_RETRIES
+            )
             
-            # Make API request
-            headers = {
-                "x-api-key": api_key,
-                "anthropic-version": self.API_VERSION,
-                "Content-Type": "application/json"
-            }
+            self._check_response(response)
             
-            payload = {
-                "model": model,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-                "top_p": top_p
-            }
+            data = orjson.loads(response.content)
+            return data['content'][0]['text']
             
-            if top_k is not None:
-                payload["top_k"] = top_k
+        except requests.exceptions.Timeout:
+            raise APIError("Anthropic API request timeout", 408, "Anthropic")
+        except APIError:
+            raise
+        except Exception as e:
+            raise APIError(f"Anthropic request failed: {str(e)}", 500, "Anthropic")
+    
+    def generate_story_stream(self, images, api_key, model="claude-3-5-sonnet-20241022",
+                              temperature=1.0, max_tokens=1000, top_p=1.0, top_k=None,
+                              few_shot_examples=None):
+        """
+        Stream a story from images using Claude Vision API
+        
+        Args:
+            Same as generate_story
+        
+        Yields:
+            Chunks of generated story text
+        """
+        try:
+            payload = self._build_payload(images, model, temperature, max_tokens, top_p, top_k, few_shot_examples)
+            payload["stream"] = True
             
-            response = requests.post(
+            response = with_retries(
+                self._session.post,
                 self.BASE_URL,
-                headers=headers,
-                json=payload,
-                timeout=current_app.config['REQUEST_TIMEOUT'] * 2
+                headers=self._headers(api_key),
+                data=orjson.dumps(payload),
+                timeout=_settings.REQUEST_TIMEOUT * 2,
+                stream=True,
+                attempts=_settings.MAX_RETRIES
             )
             
-            if response.status_code == 401:
-                raise APIError("Invalid Anthropic API key", 401, "Anthropic")
-            elif response.status_code == 429:
-                raise APIError("Anthropic API rate limit exceeded", 429, "Anthropic")
-            elif response.status_code != 200:
-                error_msg = response.json().get('error', {}).get('message', response.text)
-                raise APIError(f"Anthropic API error: {error_msg}", response.status_code, "Anthropic")
-            
-            data = response.json()
-            return data['content'][0]['text']
+            with response:
+                self._check_response(response)
+                
+                for event in self._iter_sse_data(response):
+                    if event.get('type') == 'content_block_delta':
+                        text = event.get('delta', {}).get('text')
+                        if text:
+                            yield text
+                    elif event.get('type') == 'error':
+                        error_msg = event.get('error', {}).get('message', 'stream interrupted')
+                        raise APIError(f"Anthropic API error: {error_msg}", 500, "Anthropic")
             
         except requests.exceptions.Timeout:
             raise APIError("Anthropic API request timeout", 408, "Anthropic")
@@ -287,17 +433,71 @@ class AnthropicService(BaseLLMService):
             raise
         except Exception as e:
             raise APIError(f"Anthropic request failed: {str(e)}", 500, "Anthropic")
+    
+    def _build_payload(self, images, model, temperature, max_tokens, top_p, top_k, few_shot_examples):
+        """Build the messages request body"""
+        # Prepare messages
+        messages = []
+        
+        # Add few-shot examples
+        if few_shot_examples:
+            for example in few_shot_examples[:5]:
+                user_content = [self._FEW_SHOT_PROMPT]
+                
+                if 'image_base64' in example:
+                    user_content.append(self._image_part(example['image_base64'], 'image/jpeg'))
+                
+                messages.append({"role": "user", "content": user_content})
+                messages.append({"role": "assistant", "content": example['story']})
+        
+        # Add current request
+        user_content = [self._CURRENT_PROMPT]
+        user_content.extend(self._image_part(b64_img, mime) for b64_img, mime in self._encode_images(images))
+        
+        messages.append({"role": "user", "content": user_content})
+        
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "top_p": top_p
+        }
+        
+        if top_k is not None:
+            payload["top_k"] = top_k
+        
+        return payload
+    
+    @staticmethod
+    def _image_part(b64_img, mime):
+        return {"type": "image", "source": {"type": "base64", "media_type": mime, "data": b64_img}}
+    
+    def _headers(self, api_key):
+        return {
+            "x-api-key": api_key,
+            "anthropic-version": self.API_VERSION,
+            "Content-Type": "application/json"
+        }
+    
+    @staticmethod
+    def _check_response(response):
+        """Map non-200 responses to APIError"""
+        raise_for_http(response, "Anthropic", {
+            401: "Invalid Anthropic API key",
+            429: "Anthropic API rate limit exceeded"
+        })
 
 
 class GoogleGeminiService(BaseLLMService):
     """Google Gemini Vision API integration"""
     
     BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+    HEADERS = {"Content-Type": "application/json"}
+    # Gemini text parts carry no "type" key
+    _FEW_SHOT_PROMPT = {"text": "Generate a creative story based on this image."}
+    _CURRENT_PROMPT = {"text": "Generate a creative story based on these images."}
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
     def generate_story(self, images, api_key, model="gemini-1.5-flash", 
                       temperature=1.0, max_tokens=1000, top_p=1.0, top_k=None,
                       thinking_budget=None, few_shot_examples=None):
@@ -305,7 +505,7 @@ class GoogleGeminiService(BaseLLMService):
         Generate story from images using Google Gemini API
         
         Args:
-            images: List of PIL Image objects
+            images: List of (bytes, mime type) tuples or PIL Image objects
             api_key: Google AI API key
             model: Model name (gemini-1.5-pro, gemini-1.5-flash, gemini-2.0-flash-thinking-exp)
             temperature: 0.0-2.0
@@ -319,85 +519,24 @@ class GoogleGeminiService(BaseLLMService):
             Generated story text
         """
         try:
-            # Prepare contents
-            contents = []
-            
-            # Add few-shot examples
-            if few_shot_examples:
-                for example in few_shot_examples[:5]:
-                    user_parts = [
-                        {"text": "Generate a creative story based on this image."}
-                    ]
-                    
-                    if 'image_base64' in example:
-                        user_parts.append({
-                            "inline_data": {
-                                "mime_type": "image/jpeg",
-                                "data": example['image_base64']
-                            }
-                        })
-                    
-                    contents.append({"role": "user", "parts": user_parts})
-                    contents.append({"role": "model", "parts": [{"text": example['story']}]})
-            
-            # Add current request
-            user_parts = [
-                {"text": "Generate a creative story based on these images."}
-            ]
-            
-            for img in images:
-                resized = self.image_processor.resize_image(img)
-                b64_img = self.image_processor.image_to_base64(resized, 'JPEG')
-                user_parts.append({
-                    "inline_data": {
-                        "mime_type": "image/jpeg",
-                        "data": b64_img
-                    }
-                })
-            
-            contents.append({"role": "user", "parts": user_parts})
-            
-            # Prepare generation config
-            generation_config = {
-                "temperature": temperature,
-                "maxOutputTokens": max_tokens,
-                "topP": top_p
-            }
-            
-            if top_k is not None:
-                generation_config["topK"] = top_k
-            
-            # Add thinking config for Gemini 2.0 Flash Thinking
-            if thinking_budget is not None and "thinking" in model.lower():
-                generation_config["thinkingConfig"] = {
-                    "thinkingBudget": thinking_budget
-                }
-            
-            payload = {
-                "contents": contents,
-                "generationConfig": generation_config
-            }
+            payload = self._build_payload(images, model, temperature, max_tokens, top_p, top_k,
+                                          thinking_budget, few_shot_examples)
             
             # Make API request
             url = f"{self.BASE_URL}/{model}:generateContent?key={api_key}"
             
-            response = requests.post(
+            response = with_retries(
+                self._session.post,
                 url,
-                json=payload,
-                timeout=current_app.config['REQUEST_TIMEOUT'] * 2
+                headers=self.HEADERS,
+                data=orjson.dumps(payload),
+                timeout=_settings.REQUEST_TIMEOUT * 2,
+                attempts=_settings.MAX_RETRIES
             )
             
-            if response.status_code == 400:
-                error_data = response.json()
-                if 'API_KEY_INVALID' in str(error_data):
-                    raise APIError("Invalid Google AI API key", 401, "Google Gemini")
-                raise APIError(f"Google Gemini API error: {response.text}", 400, "Google Gemini")
-            elif response.status_code == 429:
-                raise APIError("Google Gemini API rate limit exceeded", 429, "Google Gemini")
-            elif response.status_code != 200:
-                raise APIError(f"Google Gemini API error: {response.text}", response.status_code, "Google Gemini")
+            self._check_response(response)
             
-            data = response.json()
+            data = orjson.loads(response.content)
             
             if 'candidates' not in data or len(data['candidates']) == 0:
                 raise APIError("No response from Gemini", 500, "Google Gemini")
@@ -410,3 +549,105 @@ class GoogleGeminiService(BaseLLMService):
             raise
         except Exception as e:
             raise APIError(f"Google Gemini request failed: {str(e)}", 500, "Google Gemini")
+    
+    def generate_story_stream(self, images, api_key, model="gemini-1.5-flash",
+                              temperature=1.0, max_tokens=1000, top_p=1.0, top_k=None,
+                              thinking_budget=None, few_shot_examples=None):
+        """
+        Stream a story from images using Google Gemini API
+        
+        Args:
+            Same as generate_story
+        
+        Yields:
+            Chunks of generated story text
+        """
+        try:
+            payload = self._build_payload(images, model, temperature, max_tokens, top_p, top_k,
+                                          thinking_budget, few_shot_examples)
+            
+            url = f"{self.BASE_URL}/{model}:streamGenerateContent?alt=sse&key={api_key}"
+            
+            response = with_retries(
+                self._session.post,
+                url,
+                headers=self.HEADERS,
+                data=orjson.dumps(payload),
+                timeout=_settings.REQUEST_TIMEOUT * 2,
+                stream=True,
+                attempts=_settings.MAX_RETRIES
+            )
+            
+            with response:
+                self._check_response(response)
+                
+                for event in self._iter_sse_data(response):
+                    for candidate in event.get('candidates', [])[:1]:
+                        for part in candidate.get('content', {}).get('parts', []):
+                            if part.get('text') and not part.get('thought'):
+                                yield part['text']
+            
+        except requests.exceptions.Timeout:
+            raise APIError("Google Gemini API request timeout", 408, "Google Gemini")
+        except APIError:
+            raise
+        except Exception as e:
+            raise APIError(f"Google Gemini request failed: {str(e)}", 500, "Google Gemini")
+    
+    def _build_payload(self, images, model, temperature, max_tokens, top_p, top_k,
+                       thinking_budget, few_shot_examples):
+        """Build the generateContent request body"""
+        # Prepare contents
+        contents = []
+        
+        # Add few-shot examples
+        if few_shot_examples:
+            for example in few_shot_examples[:5]:
+                user_parts = [self._FEW_SHOT_PROMPT]
+                
+                if 'image_base64' in example:
+                    user_parts.append(self._image_part(example['image_base64'], 'image/jpeg'))
+                
+                contents.append({"role": "user", "parts": user_parts})
+                contents.append({"role": "model", "parts": [{"text": example['story']}]})
+        
+        # Add current request
+        user_parts = [self._CURRENT_PROMPT]
+        user_parts.extend(self._image_part(b64_img, mime) for b64_img, mime in self._encode_images(images))
+        
+        contents.append({"role": "user", "parts": user_parts})
+        
+        # Prepare generation config
+        generation_config = {
+            "temperature": temperature,
+            "maxOutputTokens": max_tokens,
+            "topP": top_p
+        }
+        
+        if top_k is not None:
+            generation_config["topK"] = top_k
+        
+        # Add thinking config for Gemini 2.0 Flash Thinking
+        if thinking_budget is not None and "thinking" in model.lower():
+            generation_config["thinkingConfig"] = {
+                "thinkingBudget": thinking_budget
+            }
+        
+        return {
+            "contents": contents,
+            "generationConfig": generation_config
+        }
+    
+    @staticmethod
+    def _image_part(b64_img, mime):
+        return {"inline_data": {"mime_type": mime, "data": b64_img}}
+    
+    @staticmethod
+    def _check_response(response):
+        """Map non-200 responses to APIError"""
+        # Gemini reports a bad key as a 400 with an API_KEY_INVALID reason
+        if response.status_code == 400 and b'API_KEY_INVALID' in response.content:
+            raise APIError("Invalid Google AI API key", 401, "Google Gemini")
+        raise_for_http(response, "Google Gemini", {
+            429: "Google Gemini API rate limit exceeded"
+        })
@@ -578,18 +578,25 @@ async function generateStory() {
         // Add few-shot examples
         formData.append('few_shot_examples', JSON.stringify(state.fewShotExamples));
         
-        const response = await fetch('/api/generate-story', {
+        const response = await fetch('/api/generate-story-stream', {
             method: 'POST',
             body: formData
         });
         
-        const data = await response.json();
-        
         if (!response.ok) {
+            const data = await response.json();
             throw new Error(data.error || 'Story generation failed');
         }
         
-        displayStory(data.story);
+        let story = '';
+        displayStory(story);
+        hideLoading();
+        
+        await readStoryStream(response, (text) => {
+            story += text;
+            displayStory(story);
+        });
+        
         showToast('Story generated successfully', 'success');
     } catch (error) {
         showToast(error.message, 'error');
@@ -598,6 +605,39 @@ async function generateStory() {
     }
 }
 
+async function readStoryStream(response, onText) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        
+        for (const raw of events) {
+            let event = 'message';
+            let data = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (!data) continue;
+            
+            const payload = JSON.parse(data);
+            if (event === 'error') {
+                throw new Error(payload.error || 'Story generation failed');
+            }
+            if (event === 'message' && payload.text) {
+                onText(payload.text);
+            }
+        }
+    }
+}
+
 function displayStory(story) {
     document.getElementById('storyText').textContent = story;
     document.getElementById('storyResult').style.display = 'block';
@@ -651,7 +691,8 @@ async function generateImage() {
             prompt,
             provider,
             api_key: apiKey,
-            model: document.getElementById('imageGenModel').value
+            model: document.getElementById('imageGenModel').value,
+            cache: document.getElementById('imageGenCache').checked
         };
         
         if (provider === 'openai') {
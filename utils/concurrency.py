@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+
+def map_concurrently(fn, items, max_workers=None):
+    """
+    Call fn on each item from a thread pool for overlapping I/O
+    
+    Results keep the order of items. The first exception cancels calls
+    that have not started yet and is re-raised.
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(items))
+    try:
+        futures = [executor.submit(fn, item) for item in items]
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in done:
+            error = future.exception()
+            if error is not None:
+                raise error
+        return [future.result() for future in futures]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
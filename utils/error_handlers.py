@@ -1,36 +1,46 @@
-from flask import jsonify
+import orjson
+
+# Fixed error bodies, serialized once. Each error still gets its own
+# Response: after_request hooks (e.g. CORS) add per-request headers, so
+# response objects cannot be shared.
+_TOO_LARGE_BODY = orjson.dumps({
+    'error': 'File too large',
+    'message': 'Maximum file size is 5MB per image'
+})
+_INTERNAL_ERROR_BODY = orjson.dumps({
+    'error': 'Internal server error',
+    'message': 'An unexpected error occurred'
+})
+_NOT_FOUND_BODY = orjson.dumps({
+    'error': 'Not found',
+    'message': 'The requested resource was not found'
+})
 
 
 def register_error_handlers(app):
     """Register global error handlers"""
     
+    def json_response(body, status):
+        return app.response_class(body, status=status, mimetype='application/json')
+    
     @app.errorhandler(413)
     def request_entity_too_large(error):
-        return jsonify({
-            'error': 'File too large',
-            'message': 'Maximum file size is 5MB per image'
-        }), 413
+        return json_response(_TOO_LARGE_BODY, 413)
     
     @app.errorhandler(400)
     def bad_request(error):
-        return jsonify({
+        return json_response(orjson.dumps({
             'error': 'Bad request',
             'message': str(error)
-        }), 400
+        }), 400)
     
     @app.errorhandler(500)
     def internal_server_error(error):
-        return jsonify({
-            'error': 'Internal server error',
-            'message': 'An unexpected error occurred'
-        }), 500
+        return json_response(_INTERNAL_ERROR_BODY, 500)
     
     @app.errorhandler(404)
     def not_found(error):
-        return jsonify({
-            'error': 'Not found',
-            'message': 'The requested resource was not found'
-        }), 404
+        return json_response(_NOT_FOUND_BODY, 404)
 
 
 class APIError(Exception):
@@ -40,3 +50,39 @@ class APIError(Exception):
         self.status_code = status_code
         self.provider = provider
         super().__init__(self.message)
+
+
+def raise_for_http(response, provider, known_codes=None, label=None, ok_codes=(200,)):
+    """
+    Raise APIError for an unsuccessful provider response
+    
+    Args:
+        response: requests.Response from the provider
+        provider: Provider name reported with the error
+        known_codes: Mapping of status code to a fixed message (body is not parsed)
+        label: Prefix for other errors, defaults to "<provider> API error"
+        ok_codes: Status codes that count as success
+    """
+    code = response.status_code
+    if code in ok_codes:
+        return
+    message = known_codes.get(code) if known_codes else None
+    if message:
+        raise APIError(message, code, provider)
+    raise APIError(f"{label or provider + ' API error'}: {_error_detail(response)}", code, provider)
+
+
+def _error_detail(response, limit=512):
+    """Provider error message from a JSON body, else the start of the raw text"""
+    try:
+        body = orjson.loads(response.content)
+    except orjson.JSONDecodeError:
+        body = None
+    if isinstance(body, dict):
+        error = body.get('error')
+        if isinstance(error, dict):
+            error = error.get('message')
+        for detail in (error, body.get('message'), body.get('detail')):
+            if isinstance(detail, str) and detail:
+                return detail[:limit]
+    return response.text[:limit]
@@ -0,0 +1,50 @@
+import hashlib
+import threading
+import orjson
+from cachetools import TTLCache
+
+# Generated images by request digest, bounded by total payload size (64MB).
+# Entries expire quickly: provider image URLs are short-lived, and repeats
+# of the same request usually arrive within minutes.
+_cache = TTLCache(
+    maxsize=64 * 1024 * 1024,
+    ttl=600,
+    getsizeof=lambda entry: sum(len(str(image)) for image in entry[0]) or 1
+)
+_cache_lock = threading.Lock()
+
+
+def request_key(provider, prompt, api_key, params):
+    """
+    BLAKE2b digest identifying a generation request
+
+    Args:
+        provider: Image generation provider
+        prompt: Text prompt
+        api_key: Caller's API key (hashed into the key, never stored)
+        params: Provider parameters with defaults already resolved
+    """
+    digest = hashlib.blake2b(orjson.dumps([provider, prompt, params], option=orjson.OPT_SORT_KEYS),
+                             digest_size=16)
+    digest.update(api_key.encode())
+    return digest.digest()
+
+
+def get_or_generate(key, generate):
+    """
+    Return the cached (images, model) for key, calling generate() on a miss
+
+    Args:
+        key: Digest from request_key()
+        generate: Callable returning (images, model)
+    """
+    with _cache_lock:
+        result = _cache.get(key)
+    if result is None:
+        result = generate()
+        with _cache_lock:
+            try:
+                _cache[key] = result
+            except ValueError:  # single result larger than the whole cache
+                pass
+    return result
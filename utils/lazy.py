@@ -0,0 +1,30 @@
+import importlib
+import threading
+
+
+class LazyServices:
+    """Registry that constructs service singletons on first access"""
+
+    def __init__(self, specs):
+        """
+        Args:
+            specs: Mapping of service name to (module path, class name)
+        """
+        self._specs = specs
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self._specs
+
+    def get(self, name):
+        """Return the named service, importing and building it if needed"""
+        service = self._instances.get(name)
+        if service is None:
+            with self._lock:
+                service = self._instances.get(name)
+                if service is None:
+                    module_path, class_name = self._specs[name]
+                    service_cls = getattr(importlib.import_module(module_path), class_name)
+                    service = self._instances[name] = service_cls()
+        return service
@@ -1,54 +1,99 @@
-import os
-from PIL import Image
-from werkzeug.utils import secure_filename
-from flask import current_app
+from config import Config
+
+# Upload limits, checked on every request (see Config)
+_ALLOWED_EXT = frozenset(Config.ALLOWED_EXTENSIONS)
+_MAX_CONTENT_LENGTH = Config.MAX_CONTENT_LENGTH
+_MAX_IMAGES = Config.MAX_IMAGES_PER_REQUEST
+
+_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+)
+
+_TYPE_EXTENSIONS = {
+    'png': frozenset({'png'}),
+    'jpeg': frozenset({'jpg', 'jpeg'}),
+    'webp': frozenset({'webp'}),
+}
+
+
+def init_validators(app):
+    """Copy the upload limits from the app config"""
+    global _ALLOWED_EXT, _MAX_CONTENT_LENGTH, _MAX_IMAGES
+    _ALLOWED_EXT = frozenset(app.config['ALLOWED_EXTENSIONS'])
+    _MAX_CONTENT_LENGTH = app.config['MAX_CONTENT_LENGTH']
+    _MAX_IMAGES = app.config['MAX_IMAGES_PER_REQUEST']
 
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+    i = filename.rfind('.')
+    return i >= 0 and filename[i + 1:].lower() in _ALLOWED_EXT
 
 
-def validate_image(file_storage):
+def read_image(file_storage):
     """
-    Validate uploaded image file
-    Returns: (is_valid, error_message)
+    Read and validate an uploaded image, without pulling an oversized
+    file fully into memory
+    Returns: (data, error_message); data is None when invalid
     """
-    # Check file exists
-    if not file_storage:
-        return False, "No file provided"
+    # Reject on the part's declared size before reading anything
+    max_size = _MAX_CONTENT_LENGTH
+    if file_storage.content_length > max_size:
+        return None, _size_error(max_size)
     
+    # One byte past the limit is enough to tell that a file is too large
+    data = file_storage.read(max_size + 1)
+    is_valid, error_msg = validate_image_bytes(data, file_storage.filename)
+    return (data if is_valid else None), error_msg
+
+
+def validate_image_bytes(data, filename):
+    """
+    Validate an uploaded image that has already been read into memory
+    Returns: (is_valid, error_message)
+    """
     # Check filename
-    if file_storage.filename == '':
+    if not filename:
         return False, "No filename"
     
     # Check extension
-    if not allowed_file(file_storage.filename):
-        return False, f"Invalid file type. Allowed: {', '.join(current_app.config['ALLOWED_EXTENSIONS'])}"
+    if not allowed_file(filename):
+        return False, f"Invalid file type. Allowed: {', '.join(_ALLOWED_EXT)}"
     
-    # Check file size (read first 5MB + 1 byte to check if exceeds limit)
-    file_storage.seek(0, os.SEEK_END)
-    file_size = file_storage.tell()
-    file_storage.seek(0)
+    # Check file size
+    max_size = _MAX_CONTENT_LENGTH
+    if len(data) > max_size:
+        return False, _size_error(max_size)
     
-    max_size = current_app.config['MAX_CONTENT_LENGTH']
-    if file_size > max_size:
-        return False, f"File size exceeds {max_size / (1024*1024):.0f}MB limit"
+    # Validate image content from its magic bytes (prevents fake extensions)
+    image_type = sniff_image_type(data)
+    if image_type is None:
+        return False, "Invalid image file: unrecognized image format"
     
-    # Validate image content (prevents fake extensions)
-    try:
-        img = Image.open(file_storage)
-        img.verify()
-        file_storage.seek(0)  # Reset after verify
-        return True, None
-    except Exception as e:
-        return False, f"Invalid image file: {str(e)}"
+    if _TYPE_EXTENSIONS[image_type].isdisjoint(_ALLOWED_EXT):
+        return False, f"Invalid file type. Allowed: {', '.join(_ALLOWED_EXT)}"
+    
+    return True, None
+
+
+def _size_error(max_size):
+    return f"File size exceeds {max_size / (1024*1024):.0f}MB limit"
+
+
+def sniff_image_type(data):
+    """Identify PNG, JPEG or WebP content from its header; returns None otherwise"""
+    for signature, image_type in _SIGNATURES:
+        if data.startswith(signature):
+            return image_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
 
 
 def validate_image_count(count):
     """Validate number of images"""
-    max_images = current_app.config['MAX_IMAGES_PER_REQUEST']
+    max_images = _MAX_IMAGES
     if count > max_images:
         return False, f"Too many images. Maximum {max_images} allowed"
     if count < 1: